@@ -4,44 +4,129 @@
 toio-mcp server - MCP server for toio Core Cube
 """
 
+import argparse
 import asyncio
+import contextlib
+import functools
+import inspect
 import logging
+import operator
+import re
 import sys
-from typing import Dict, List, Optional, Any, Union, Sequence
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-import typer
-from rich.logging import RichHandler
-from mcp.server.fastmcp import FastMCP
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
 from toio.cube import ToioCoreCube
-from toio.scanner import BLEScanner
-from toio.cube.api.id_information import PositionId, StandardId, PositionIdMissed, StandardIdMissed
-from toio.cube.api.sound import SoundId, Note, MidiNote
 from toio.cube.api.button import ButtonState
+from toio.cube.api.configuration import (
+    MagneticSensorCondition,
+    MagneticSensorFunction,
+)
+from toio.cube.api.id_information import (
+    IdInformation,
+    PositionId,
+    PositionIdMissed,
+    StandardId,
+    StandardIdMissed,
+)
 from toio.cube.api.indicator import Color, IndicatorParam
 from toio.cube.api.sensor import (
-    PostureDataType,
-    Posture,
     MagneticSensorData,
     MotionDetectionData,
+    Posture,
     PostureAngleEulerData,
-    PostureAngleQuaternionsData,
     PostureAngleHighPrecisionEulerData,
+    PostureAngleQuaternionsData,
+    PostureDataType,
+    Sensor,
 )
-from toio.cube.api.configuration import (
-    MagneticSensorFunction,
-    MagneticSensorCondition,
-)
+from toio.cube.api.sound import MidiNote, Note, SoundId
+from toio.device_interface import CubeInfo
+from toio.device_interface.ble import BleCube
+from toio.toio_uuid import TOIO_UUID_SERVICE
 
-# Configure logging
-logging.basicConfig(
-    level=logging.CRITICAL,
-    format="%(message)s",
-    datefmt="[%X]",
-    # handlers=[RichHandler(rich_tracebacks=True)],
-    handlers=[logging.StreamHandler(sys.stderr)]
-)
+if TYPE_CHECKING:
+    from mcp.server.fastmcp import FastMCP
+
+# Pass arguments to the logger (%-style) rather than pre-formatting them so
+# records dropped by the level filter are never formatted; guard any log call
+# whose arguments are costly to compute with logger.isEnabledFor()
 logger = logging.getLogger("toio-mcp")
 
+TOIO_SERVICE_UUID = str(TOIO_UUID_SERVICE)
+
+# Scanned devices not seen for this many seconds are treated as gone
+SCAN_CACHE_TTL = 30.0
+
+# Seconds connect_cube / connect_cubes wait for a device not scanned yet
+CONNECT_SCAN_TIMEOUT = 5.0
+
+# Motor writes per cube left in flight before motor_control waits for one
+MOTOR_MAX_INFLIGHT = 2
+
+# Upper bound in seconds for a single position read over BLE
+POSITION_READ_TIMEOUT = 1.0
+
+# Extra seconds a scan may take beyond its timeout (e.g. starting the scanner)
+SCAN_TIMEOUT_MARGIN = 2.0
+
+# BLE device IDs: MAC address (Linux / Windows) or CoreBluetooth UUID (macOS)
+_DEVICE_ID_PATTERN = re.compile(
+    r"[0-9A-F]{2}(?::[0-9A-F]{2}){5}"
+    r"|[0-9A-F]{8}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{12}",
+    re.IGNORECASE,
+)
+
+
+class DeviceInfo(NamedTuple):
+    """Scan result for a toio Core Cube"""
+    device_id: str
+    name: Optional[str]
+    rssi: int
+
+
+def _log_task_failure(task: asyncio.Task) -> None:
+    """Log the exception of a finished background task, if any"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed: %s", task.exception())
+
+
+def _raise_motor_failure(pool: List[Tuple[Tuple[int, int, int], asyncio.Task]]) -> None:
+    """
+    Drop finished motor writes from a pool, raising the first that failed
+
+    Args:
+        pool: Motor writes in flight with their commands, oldest first
+    """
+    error = None
+    pending = []
+    for entry in pool:
+        task = entry[1]
+        if not task.done():
+            pending.append(entry)
+        elif error is None and not task.cancelled():
+            error = task.exception()
+    pool[:] = pending
+    if error is not None:
+        raise error
+
 
 #################################################
 # CubeManager class
@@ -52,37 +137,186 @@ class CubeManager:
     CubeManager class for managing toio Core Cubes
     """
 
+    __slots__ = (
+        "_cubes",
+        "_device_map",
+        "_cube_to_device",
+        "_scan_cache",
+        "_scan_seen",
+        "_scanner",
+        "_scanner_lock",
+        "_connect_locks",
+        "_next_id",
+        "_scan_updated",
+        "_background_tasks",
+        "_last_position",
+        "_position_handlers",
+        "_sensor_handlers",
+        "_sensor_waiters",
+        "_motor_tasks",
+    )
+
     def __init__(self):
         """Initialize CubeManager"""
         self._cubes: Dict[str, ToioCoreCube] = {}
         self._device_map: Dict[str, str] = {}  # device_id -> cube_id
+        self._cube_to_device: Dict[str, str] = {}  # cube_id -> device_id
+        self._scan_cache: Dict[str, CubeInfo] = {}  # device_id -> last advertisement
+        self._scan_seen: Dict[str, float] = {}  # device_id -> monotonic time last seen
+        self._scanner: Optional[BleakScanner] = None
+        self._scanner_lock = asyncio.Lock()
+        self._connect_locks: Dict[str, asyncio.Lock] = {}  # device_id -> lock
+        self._next_id = 0
+        self._scan_updated = asyncio.Event()  # set when a new cube is seen
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._last_position: Dict[str, Any] = {}  # cube_id -> last id_information payload
+        self._position_handlers: Dict[str, Callable[[bytearray], None]] = {}
+        self._sensor_handlers: Dict[ToioCoreCube, Callable[[bytearray], None]] = {}
+        # cube -> sensor requests waiting for a reply, with the expected type
+        self._sensor_waiters: Dict[
+            ToioCoreCube, List[Tuple[type, asyncio.Future]]
+        ] = {}
+        # cube_id -> motor writes in flight, oldest first, with their (left, right, duration_ms)
+        self._motor_tasks: Dict[str, List[Tuple[Tuple[int, int, int], asyncio.Task]]] = {}
+
+    async def _ensure_scanner(self) -> None:
+        """Start the shared background scanner if it is not running yet"""
+        if self._scanner is not None:
+            return
+        # Concurrent callers wait for the one start() in flight; the scanner is
+        # only published once started so a failed start is retried next time
+        async with self._scanner_lock:
+            if self._scanner is not None:
+                return
+            scanner = BleakScanner(
+                detection_callback=self._on_advertisement,
+                service_uuids=[TOIO_SERVICE_UUID],
+            )
+            await scanner.start()
+            self._scanner = scanner
+
+    async def _stop_scanner(self) -> None:
+        """Stop the shared background scanner if it is running"""
+        async with self._scanner_lock:
+            scanner, self._scanner = self._scanner, None
+            if scanner is not None:
+                await scanner.stop()
+
+    def _on_advertisement(self, device: BLEDevice, advertisement: AdvertisementData) -> None:
+        """Record a toio Core Cube advertisement in the scan cache"""
+        if TOIO_SERVICE_UUID not in advertisement.service_uuids:
+            return
+        now = time.monotonic()
+        last_seen = self._scan_seen.get(device.address)
+        self._scan_seen[device.address] = now
+        cached = self._scan_cache.get(device.address)
+        if cached is None:
+            self._scan_cache[device.address] = CubeInfo(
+                name=device.name,
+                device=device,
+                interface=BleCube(device),
+                advertisement=advertisement,
+            )
+            # Wake up waiters whose condition depends on newly seen cubes
+            self._scan_updated.set()
+        else:
+            # Keep the existing interface, only refresh name / RSSI
+            self._scan_cache[device.address] = cached._replace(
+                name=device.name, device=device, advertisement=advertisement
+            )
+            if last_seen is None or now - last_seen >= SCAN_CACHE_TTL:
+                # A cube that had gone stale is back
+                self._scan_updated.set()
+
+    def _fresh_device(self, device_id: str) -> Optional[CubeInfo]:
+        """
+        Get a scanned device if it advertised recently
+
+        Args:
+            device_id: Device ID to look up
 
-    async def scan_cubes(self, num: int = 1, timeout: float = 5.0) -> List[Dict[str, str]]:
+        Returns:
+            CubeInfo seen within SCAN_CACHE_TTL seconds, or None
+        """
+        last_seen = self._scan_seen.get(device_id)
+        if last_seen is None or time.monotonic() - last_seen >= SCAN_CACHE_TTL:
+            return None
+        return self._scan_cache.get(device_id)
+
+    def _fresh_devices(self) -> List[CubeInfo]:
+        """
+        Get all scanned devices that advertised recently and are free to connect
+
+        Connected cubes stop advertising but stay in the cache, so they are
+        left out.
+
+        Returns:
+            List of CubeInfo seen within SCAN_CACHE_TTL seconds
+        """
+        now = time.monotonic()
+        return [
+            info for device_id, info in self._scan_cache.items()
+            if now - self._scan_seen[device_id] < SCAN_CACHE_TTL
+            and device_id not in self._device_map
+        ]
+
+    async def _wait_for_scan(self, condition: Callable[[], bool], timeout: float) -> None:
+        """
+        Wait until the scan cache satisfies a condition
+
+        Args:
+            condition: Predicate evaluated against the scan cache
+            timeout: Maximum time to wait in seconds
+        """
+        await self._ensure_scanner()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Re-check only when a new cube is seen, so the wait ends as soon as the
+        # condition holds instead of running to the full timeout
+        while not condition():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._scan_updated.clear()
+            try:
+                await asyncio.wait_for(self._scan_updated.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+    async def scan_cubes(
+        self, num: int = 1, timeout: float = 5.0, sort_by_rssi: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Scan for toio Core Cubes
 
         Args:
             num: Number of cubes to scan for
             timeout: Scan timeout in seconds
+            sort_by_rssi: Scan for the full timeout and return the num cubes
+                with the strongest signal instead of the first num found
 
         Returns:
             List of dictionaries containing device information
         """
-        logger.info(f"Scanning for {num} toio Core Cubes (timeout: {timeout}s)")
+        logger.info("Scanning for %d toio Core Cubes (timeout: %ss)", num, timeout)
         try:
-            devices = await BLEScanner.scan(num=num, timeout=timeout)
-            result = []
-            for device in devices:
-                device_info = {
-                    "device_id": device.device.address,
-                    "name": device.name,
-                    "rssi": device.advertisement.rssi,
-                }
-                result.append(device_info)
-            logger.info(f"Found {len(result)} toio Core Cubes")
+            if sort_by_rssi:
+                await self._wait_for_scan(lambda: False, timeout)
+            else:
+                await self._wait_for_scan(lambda: len(self._fresh_devices()) >= num, timeout)
+            devices = sorted(
+                self._fresh_devices(),
+                key=lambda d: d.advertisement.rssi,
+                reverse=True,
+            )[:num]
+            result = [
+                DeviceInfo(d.device.address, d.name, d.advertisement.rssi)._asdict()
+                for d in devices
+            ]
+            logger.info("Found %d toio Core Cubes", len(result))
             return result
         except Exception as e:
-            logger.error(f"Error scanning for toio Core Cubes: {e}")
+            logger.error("Error scanning for toio Core Cubes: %s", e)
             raise
 
     async def connect_cube(self, device_id: str) -> str:
@@ -95,39 +329,100 @@ class CubeManager:
         Returns:
             Cube ID of the connected cube
         """
-        logger.info(f"Connecting to toio Core Cube with device_id: {device_id}")
+        return await self._connect_one(device_id, wait=True)
+
+    async def _connect_one(self, device_id: str, wait: bool) -> str:
+        """
+        Connect to a toio Core Cube
+
+        Args:
+            device_id: Device ID to connect to
+            wait: Wait for the device to be scanned if it has not been seen
+                yet; connect_cubes waits once for all its devices instead
+
+        Returns:
+            Cube ID of the connected cube
+        """
+        logger.info("Connecting to toio Core Cube with device_id: %s", device_id)
         try:
-            # Check if already connected
+            # Fast path: already connected, no lock needed
             if device_id in self._device_map:
                 cube_id = self._device_map[device_id]
-                logger.info(f"Already connected to cube with ID: {cube_id}")
+                logger.info("Already connected to cube with ID: %s", cube_id)
                 return cube_id
 
-            # Scan for the device
-            devices = await BLEScanner.scan(num=10, timeout=5.0)
-            target_device = None
-            for device in devices:
-                if device.device.address == device_id:
-                    target_device = device
-                    break
+            # Reject IDs that cannot be a BLE address (e.g. a cube_id) before
+            # waiting on the scanner for a device that will never appear
+            if not _DEVICE_ID_PATTERN.fullmatch(device_id):
+                raise ValueError(f"Invalid device ID: {device_id}")
+
+            # Serialize connection attempts per device so concurrent calls do
+            # not scan for and connect the same cube twice
+            lock = self._connect_locks.setdefault(device_id, asyncio.Lock())
+            async with lock:
+                if device_id in self._device_map:
+                    return self._device_map[device_id]
+
+                # Served by the background scanner; only wait if not seen yet
+                target_device = self._fresh_device(device_id)
+                if target_device is None and wait:
+                    await self._wait_for_scan(
+                        lambda: self._fresh_device(device_id) is not None,
+                        CONNECT_SCAN_TIMEOUT,
+                    )
+                    target_device = self._fresh_device(device_id)
+
+                if target_device is None:
+                    raise ValueError(f"Device with ID {device_id} not found")
+
+                # Connect to the device
+                cube = ToioCoreCube(target_device.interface)
+                await cube.connect()
+
+                # Generate a cube ID and store the cube; IDs are never reused
+                self._next_id += 1
+                cube_id = f"cube_{self._next_id}"
+                self._cubes[cube_id], self._device_map[device_id], self._cube_to_device[cube_id] = (
+                    cube, cube_id, device_id
+                )
 
-            if target_device is None:
-                raise ValueError(f"Device with ID {device_id} not found")
+                logger.info("Connected to cube with ID: %s", cube_id)
+                return cube_id
+        except Exception as e:
+            logger.error("Error connecting to toio Core Cube: %s", e)
+            raise
 
-            # Connect to the device
-            cube = ToioCoreCube(target_device.interface)
-            await cube.connect()
+    async def connect_cubes(self, device_ids: List[str]) -> List[Union[str, BaseException]]:
+        """
+        Connect to several toio Core Cubes at once
 
-            # Generate a cube ID and store the cube
-            cube_id = f"cube_{len(self._cubes) + 1}"
-            self._cubes[cube_id] = cube
-            self._device_map[device_id] = cube_id
+        Args:
+            device_ids: Device IDs to connect to
 
-            logger.info(f"Connected to cube with ID: {cube_id}")
-            return cube_id
-        except Exception as e:
-            logger.error(f"Error connecting to toio Core Cube: {e}")
-            raise
+        Returns:
+            Cube ID, or the exception raised while connecting, for each
+            device, in the order of device_ids
+        """
+        logger.info("Connecting to %d toio Core Cubes", len(device_ids))
+        # Wait once for every address not seen yet instead of once per cube
+        missing = [
+            d for d in device_ids
+            if d not in self._device_map
+            and self._fresh_device(d) is None
+            and _DEVICE_ID_PATTERN.fullmatch(d)
+        ]
+        if missing:
+            await self._wait_for_scan(
+                lambda: all(self._fresh_device(d) is not None for d in missing),
+                CONNECT_SCAN_TIMEOUT,
+            )
+        # Establish the GATT connections concurrently; one failing cube must
+        # not abort the others
+        results = await asyncio.gather(
+            *(self._connect_one(d, wait=False) for d in device_ids),
+            return_exceptions=True,
+        )
+        return list(results)
 
     async def disconnect_cube(self, cube_id: str) -> bool:
         """
@@ -139,30 +434,47 @@ class CubeManager:
         Returns:
             True if disconnected successfully, False otherwise
         """
-        logger.info(f"Disconnecting from cube with ID: {cube_id}")
+        logger.info("Disconnecting from cube with ID: %s", cube_id)
         try:
             if cube_id not in self._cubes:
-                logger.warning(f"Cube with ID {cube_id} not found")
+                logger.warning("Cube with ID %s not found", cube_id)
                 return False
 
             cube = self._cubes[cube_id]
-            await cube.disconnect()
+            device_id = self._cube_to_device.get(cube_id)
+            # Let queued motor writes land before the link closes instead of
+            # failing against it; taking the queue also drops waiting commands
+            pool = self._motor_tasks.pop(cube_id, None)
+            if pool:
+                await asyncio.wait([task for _, task in pool])
+
+            if cube.is_connect():
+                await cube.disconnect()
+            else:
+                # The link is already gone; release what is left but remove the
+                # cube regardless so it does not linger as connected
+                try:
+                    await cube.disconnect()
+                except Exception as e:
+                    logger.warning("Error closing lost link to cube %s: %s", cube_id, e)
 
             # Remove the cube from the dictionaries
-            device_id = None
-            for d_id, c_id in self._device_map.items():
-                if c_id == cube_id:
-                    device_id = d_id
-                    break
-
+            self._cube_to_device.pop(cube_id, None)
             if device_id:
-                del self._device_map[device_id]
+                self._device_map.pop(device_id, None)
+                # The interface cannot be reconnected; take a fresh one next time
+                self._scan_cache.pop(device_id, None)
+                self._scan_seen.pop(device_id, None)
             del self._cubes[cube_id]
+            self._position_handlers.pop(cube_id, None)
+            self._last_position.pop(cube_id, None)
+            self._sensor_handlers.pop(cube, None)
+            self._sensor_waiters.pop(cube, None)
 
-            logger.info(f"Disconnected from cube with ID: {cube_id}")
+            logger.info("Disconnected from cube with ID: %s", cube_id)
             return True
         except Exception as e:
-            logger.error(f"Error disconnecting from toio Core Cube: {e}")
+            logger.error("Error disconnecting from toio Core Cube: %s", e)
             return False
 
     def get_connected_cubes(self) -> List[str]:
@@ -186,21 +498,268 @@ class CubeManager:
         """
         return self._cubes.get(cube_id)
 
+    def require_cube(self, cube_id: str) -> ToioCoreCube:
+        """
+        Get a cube by ID, raising if it is not connected
+
+        Args:
+            cube_id: Cube ID to get
+
+        Returns:
+            ToioCoreCube instance
+
+        Raises:
+            KeyError: If no cube with the given ID is connected
+        """
+        return self._cubes[cube_id]
+
+    async def motor_control(self, cube_id: str, left: int, right: int, duration_ms: int = 0) -> bool:
+        """
+        Send a motor command without waiting for the BLE write to finish
+
+        Up to MOTOR_MAX_INFLIGHT writes per cube are kept in flight; beyond
+        that the call waits for the oldest to finish. A command identical to
+        the newest one still in flight is dropped, and so is a command still
+        waiting when motor_stop or disconnect_cube is called.
+
+        Args:
+            cube_id: Cube ID to control
+            left: Left motor speed
+            right: Right motor speed
+            duration_ms: Duration in milliseconds (0 for continuous)
+
+        Returns:
+            False if the command was dropped because the motors were stopped
+            while it waited, True otherwise
+
+        Raises:
+            KeyError: If no cube with the given ID is connected
+            Exception: If an earlier write to the cube failed; this command
+                is not sent
+        """
+        cube = self._cubes[cube_id]
+        command = (left, right, duration_ms)
+        pool = self._motor_tasks.setdefault(cube_id, [])
+        _raise_motor_failure(pool)
+        if pool and pool[-1][0] == command:
+            return True
+        while len(pool) >= MOTOR_MAX_INFLIGHT:
+            await asyncio.wait([task for _, task in pool], return_when=asyncio.FIRST_COMPLETED)
+            if self._motor_tasks.get(cube_id) is not pool:
+                # motor_stop or disconnect_cube took the queue while we waited;
+                # sending now would override the stop
+                return False
+            _raise_motor_failure(pool)
+        task = self.spawn(cube.api.motor.motor_control(left, right, duration_ms))
+        pool.append((command, task))
+        return True
+
+    async def motor_stop(self, cube_id: str) -> None:
+        """
+        Stop the motors of a cube once its queued motor commands are sent
+
+        Commands still waiting for a free slot in motor_control are dropped.
+
+        Args:
+            cube_id: Cube ID to stop
+
+        Raises:
+            KeyError: If no cube with the given ID is connected
+            Exception: If the stop write failed
+        """
+        cube = self._cubes[cube_id]
+        pool = self._motor_tasks.pop(cube_id, None)
+        if pool:
+            # Let earlier commands land first so they cannot override the stop.
+            # Their failures were logged when they finished and say nothing
+            # about whether the stop itself gets through
+            await asyncio.wait([task for _, task in pool])
+        await cube.api.motor.motor_control(0, 0)
+
+    def _on_position(self, cube_id: str, payload: bytearray) -> None:
+        """Store the position from an id_information notification"""
+        position = IdInformation.is_my_data(payload)
+        if position is not None:
+            self._last_position[cube_id] = position
+
+    async def read_position(self, cube_id: str) -> Any:
+        """
+        Get the latest position of a cube
+
+        The first call subscribes to id_information notifications so later
+        calls are served from the last notified value without a GATT read.
+
+        Args:
+            cube_id: Cube ID to get position from
+
+        Returns:
+            Latest id_information payload, or None if unavailable
+
+        Raises:
+            KeyError: If no cube with the given ID is connected
+        """
+        cube = self._cubes[cube_id]
+        if cube_id not in self._position_handlers:
+            # One shared method; the partial only binds the cube ID. Record it
+            # before awaiting so concurrent callers do not register it twice
+            handler = functools.partial(self._on_position, cube_id)
+            self._position_handlers[cube_id] = handler
+            try:
+                await cube.api.id_information.register_notification_handler(handler)
+            except BaseException:
+                if self._position_handlers.get(cube_id) is handler:
+                    del self._position_handlers[cube_id]
+                # A timeout may cancel the call after toio stored the handler;
+                # drop it there too so it does not outlive the cube
+                self.spawn(cube.api.id_information.unregister_notification_handler(handler))
+                raise
+
+        position = self._last_position.get(cube_id)
+        if position is None:
+            # Nothing notified yet (e.g. the cube has not moved)
+            position = await cube.api.id_information.read()
+        return position
+
+    def _on_sensor(self, cube: ToioCoreCube, payload: bytearray) -> None:
+        """Hand a sensor notification to the requests waiting for its type"""
+        waiters = self._sensor_waiters.get(cube)
+        if not waiters:
+            return
+        data = Sensor.is_my_data(payload)
+        for expected_type, future in waiters:
+            if isinstance(data, expected_type) and not future.done():
+                future.set_result(data)
+
+    async def request_sensor_data(
+        self,
+        cube: ToioCoreCube,
+        request: Callable[[], Awaitable[None]],
+        expected_type: type,
+        timeout: float = 0.5,
+    ) -> Any:
+        """
+        Send a sensor information request and wait for the matching notification
+
+        The Sensor characteristic is shared by motion / posture / magnetic data,
+        so the reply is filtered by payload type. The first call subscribes to
+        the cube's sensor notifications; later calls reuse the subscription.
+
+        Args:
+            cube: ToioCoreCube to read from
+            request: Callable creating the request coroutine, called once the
+                handler is registered
+            expected_type: Sensor payload type to wait for
+            timeout: Maximum time to wait for the reply in seconds
+
+        Returns:
+            Sensor payload of expected_type, or None on timeout
+        """
+        if cube not in self._sensor_handlers:
+            # Record the handler before awaiting so concurrent callers do not
+            # register it twice
+            handler = functools.partial(self._on_sensor, cube)
+            self._sensor_handlers[cube] = handler
+            try:
+                await cube.api.sensor.register_notification_handler(handler)
+            except BaseException:
+                if self._sensor_handlers.get(cube) is handler:
+                    del self._sensor_handlers[cube]
+                # A timeout may cancel the call after toio stored the handler
+                self.spawn(cube.api.sensor.unregister_notification_handler(handler))
+                raise
+
+        waiter = (expected_type, asyncio.get_running_loop().create_future())
+        waiters = self._sensor_waiters.setdefault(cube, [])
+        waiters.append(waiter)
+        try:
+            await request()
+            return await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters.remove(waiter)
+
+    def spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """
+        Run a coroutine in the background
+
+        A reference is kept until the task finishes so it cannot be garbage
+        collected mid-flight, and failures are logged instead of being lost.
+
+        Args:
+            coro: Coroutine to run
+
+        Returns:
+            The created task
+        """
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        task.add_done_callback(_log_task_failure)
+        return task
+
     async def disconnect_all(self) -> None:
         """
         Disconnect from all connected cubes
         """
         logger.info("Disconnecting from all cubes")
+        try:
+            await self._stop_scanner()
+        except Exception as e:
+            logger.error("Error stopping the scanner: %s", e)
         cube_ids = list(self._cubes.keys())
-        for cube_id in cube_ids:
-            await self.disconnect_cube(cube_id)
+        # Each cube is torn down independently, so overlap the BLE round-trips
+        await asyncio.gather(
+            *(self.disconnect_cube(cube_id) for cube_id in cube_ids),
+            return_exceptions=True,
+        )
 
 
 #################################################
 # Tool functions
 #################################################
 
-async def _scan_cubes(cube_manager: CubeManager, num: int = 1, timeout: float = 5.0):
+
+def _not_found(cube_id: str) -> Dict[str, Any]:
+    """Build the error response for an unknown cube ID"""
+    return {"error": f"Cube with ID {cube_id} not found"}
+
+def _with_cube(
+    fn: Callable[..., Awaitable[Dict[str, Any]]],
+) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """
+    Resolve the cube for a per-cube tool and turn its errors into responses
+
+    The decorated coroutine takes (cube_manager, cube, ...) and is exposed as
+    (cube_manager, cube_id, ...), so FastMCP still sees a cube_id parameter.
+
+    Args:
+        fn: Tool coroutine taking the ToioCoreCube as its second argument
+
+    Returns:
+        Tool coroutine taking the cube ID as its second argument
+    """
+    @functools.wraps(fn)
+    async def wrapper(
+        cube_manager: CubeManager, cube_id: str, *args: Any, **kwargs: Any
+    ) -> Dict[str, Any]:
+        try:
+            cube = cube_manager.require_cube(cube_id)
+        except KeyError:
+            return _not_found(cube_id)
+        try:
+            return await fn(cube_manager, cube, *args, **kwargs)
+        except Exception as e:
+            return {"error": str(e)}
+
+    signature = inspect.signature(fn)
+    parameters = list(signature.parameters.values())
+    parameters[1] = parameters[1].replace(name="cube_id", annotation=str)
+    # The explicit signature takes precedence over the __wrapped__ one
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
+
+async def _scan_cubes(cube_manager: CubeManager, num: int = 1, timeout: float = 5.0, sort_by_rssi: bool = False) -> Dict[str, Any]:
     """
     Scan for toio Core Cubes
 
@@ -208,17 +767,23 @@ async def _scan_cubes(cube_manager: CubeManager, num: int = 1, timeout: float =
         cube_manager: CubeManager instance
         num: Number of cubes to scan for
         timeout: Scan timeout in seconds
+        sort_by_rssi: Scan for the full timeout and keep the strongest signals
 
     Returns:
         Dict with list of devices
     """
     try:
-        devices = await cube_manager.scan_cubes(num=num, timeout=timeout)
+        devices = await asyncio.wait_for(
+            cube_manager.scan_cubes(num=num, timeout=timeout, sort_by_rssi=sort_by_rssi),
+            timeout + SCAN_TIMEOUT_MARGIN,
+        )
         return {"devices": devices}
+    except asyncio.TimeoutError:
+        return {"error": "Timed out scanning for toio Core Cubes"}
     except Exception as e:
         return {"error": str(e)}
 
-async def _connect_cube(cube_manager: CubeManager, device_id: str):
+async def _connect_cube(cube_manager: CubeManager, device_id: str) -> Dict[str, Any]:
     """
     Connect to a toio Core Cube
 
@@ -235,7 +800,33 @@ async def _connect_cube(cube_manager: CubeManager, device_id: str):
     except Exception as e:
         return {"error": str(e)}
 
-async def _disconnect_cube(cube_manager: CubeManager, cube_id: str):
+async def _connect_cubes(cube_manager: CubeManager, device_ids: List[str]) -> Dict[str, Any]:
+    """
+    Connect to several toio Core Cubes at once
+
+    Args:
+        cube_manager: CubeManager instance
+        device_ids: Device IDs to connect to
+
+    Returns:
+        Dict with list of cube IDs (None where connecting failed) and
+        errors keyed by device ID
+    """
+    try:
+        results = await cube_manager.connect_cubes(device_ids)
+        cube_ids = []
+        errors = {}
+        for device_id, result in zip(device_ids, results):
+            if isinstance(result, BaseException):
+                cube_ids.append(None)
+                errors[device_id] = str(result)
+            else:
+                cube_ids.append(result)
+        return {"cube_ids": cube_ids, "errors": errors}
+    except Exception as e:
+        return {"error": str(e)}
+
+async def _disconnect_cube(cube_manager: CubeManager, cube_id: str) -> Dict[str, Any]:
     """
     Disconnect from a toio Core Cube
 
@@ -252,7 +843,7 @@ async def _disconnect_cube(cube_manager: CubeManager, cube_id: str):
     except Exception as e:
         return {"error": str(e)}
 
-async def _get_connected_cubes(cube_manager: CubeManager):
+async def _get_connected_cubes(cube_manager: CubeManager) -> Dict[str, Any]:
     """
     Get a list of connected cubes
 
@@ -262,13 +853,10 @@ async def _get_connected_cubes(cube_manager: CubeManager):
     Returns:
         Dict with list of cube IDs
     """
-    try:
-        cubes = cube_manager.get_connected_cubes()
-        return {"cubes": cubes}
-    except Exception as e:
-        return {"error": str(e)}
+    # get_connected_cubes only reads in-memory state and cannot fail
+    return {"cubes": cube_manager.get_connected_cubes()}
 
-async def _motor_control(cube_manager: CubeManager, cube_id: str, left: int, right: int, duration_ms: int = 0):
+async def _motor_control(cube_manager: CubeManager, cube_id: str, left: int, right: int, duration_ms: int = 0) -> Dict[str, Any]:
     """
     Control the motors of a toio Core Cube
     
@@ -280,19 +868,19 @@ async def _motor_control(cube_manager: CubeManager, cube_id: str, left: int, rig
         duration_ms: Duration in milliseconds (0 for continuous)
     
     Returns:
-        Dict with success status
+        Dict with success status; dropped is set if a motor_stop superseded
+        the command before it was sent
     """
     try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-
-        await cube.api.motor.motor_control(left, right, duration_ms)
+        if not await cube_manager.motor_control(cube_id, left, right, duration_ms):
+            return {"controlled": False, "dropped": True}
         return {"controlled": True}
+    except KeyError:
+        return _not_found(cube_id)
     except Exception as e:
         return {"error": str(e)}
 
-async def _motor_stop(cube_manager: CubeManager, cube_id: str):
+async def _motor_stop(cube_manager: CubeManager, cube_id: str) -> Dict[str, Any]:
     """
     Stop the motors of a toio Core Cube
 
@@ -304,22 +892,21 @@ async def _motor_stop(cube_manager: CubeManager, cube_id: str):
         Dict with success status
     """
     try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-
-        await cube.api.motor.motor_control(0, 0)
+        await cube_manager.motor_stop(cube_id)
         return {"stopped": True}
+    except KeyError:
+        return _not_found(cube_id)
     except Exception as e:
         return {"error": str(e)}
 
-async def _set_indicator(cube_manager: CubeManager, cube_id: str, r: int, g: int, b: int, duration_ms: int = 0):
+@_with_cube
+async def _set_indicator(cube_manager: CubeManager, cube: ToioCoreCube, r: int, g: int, b: int, duration_ms: int = 0) -> Dict[str, Any]:
     """
     Set the LED color of a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to control
+        cube: Cube to control
         r: Red component (0-255)
         g: Green component (0-255)
         b: Blue component (0-255)
@@ -328,20 +915,44 @@ async def _set_indicator(cube_manager: CubeManager, cube_id: str, r: int, g: int
     Returns:
         Dict with success status
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-
-        from toio.cube.api.indicator import Color, IndicatorParam
-        color = Color(r, g, b)
-        param = IndicatorParam(duration_ms=duration_ms, color=color)
-        await cube.api.indicator.turn_on(param)
-        return {"set": True}
-    except Exception as e:
-        return {"error": str(e)}
-
-async def _get_position(cube_manager: CubeManager, cube_id: str):
+    color = Color(r, g, b)
+    param = IndicatorParam(duration_ms=duration_ms, color=color)
+    await cube.api.indicator.turn_on(param)
+    return {"set": True}
+
+def _handle_position_id(position: PositionId) -> Dict[str, Any]:
+    """Format a PositionId reading"""
+    center = position.center
+    sensor = position.sensor
+    center_point = center.point
+    sensor_point = sensor.point
+    return {
+        "type": "position_id",
+        "center_x": center_point.x,
+        "center_y": center_point.y,
+        "center_angle": center.angle,
+        "sensor_x": sensor_point.x,
+        "sensor_y": sensor_point.y,
+        "sensor_angle": sensor.angle,
+    }
+
+def _handle_standard_id(position: StandardId) -> Dict[str, Any]:
+    """Format a StandardId reading"""
+    return {
+        "type": "standard_id",
+        "value": position.value,
+        "angle": position.angle,
+    }
+
+# Position payload type -> result formatter
+_POSITION_HANDLERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {
+    PositionId: _handle_position_id,
+    StandardId: _handle_standard_id,
+    PositionIdMissed: lambda position: {"type": "position_id_missed"},
+    StandardIdMissed: lambda position: {"type": "standard_id_missed"},
+}
+
+async def _get_position(cube_manager: CubeManager, cube_id: str) -> Dict[str, Any]:
     """
     Get the position of a toio Core Cube
 
@@ -353,75 +964,50 @@ async def _get_position(cube_manager: CubeManager, cube_id: str):
         Dict with position information
     """
     try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
+        position = await asyncio.wait_for(
+            cube_manager.read_position(cube_id), POSITION_READ_TIMEOUT
+        )
+    except KeyError:
+        return _not_found(cube_id)
+    except asyncio.TimeoutError:
+        return {"error": "Timed out reading position information"}
+    except Exception as e:
+        return {"error": str(e)}
 
-        position = await cube.api.id_information.read()
+    try:
         if position is None:
             return {"error": "Failed to get position information"}
 
-        result = {}
-        
-        # Handle different types of position information
-        if isinstance(position, PositionId):
-            result = {
-                "type": "position_id",
-                "center_x": position.center.point.x,
-                "center_y": position.center.point.y,
-                "center_angle": position.center.angle,
-                "sensor_x": position.sensor.point.x,
-                "sensor_y": position.sensor.point.y,
-                "sensor_angle": position.sensor.angle,
-            }
-        elif isinstance(position, StandardId):
-            result = {
-                "type": "standard_id",
-                "value": position.value,
-                "angle": position.angle,
-            }
-        elif isinstance(position, PositionIdMissed):
-            result = {
-                "type": "position_id_missed",
-            }
-        elif isinstance(position, StandardIdMissed):
-            result = {
-                "type": "standard_id_missed",
-            }
-        return result
+        handler = _POSITION_HANDLERS.get(type(position))
+        return handler(position) if handler else {}
     except Exception as e:
         return {"error": str(e)}
 
-async def _play_sound_effect(cube_manager: CubeManager, cube_id: str, sound_id: int, volume: int = 255):
+@_with_cube
+async def _play_sound_effect(cube_manager: CubeManager, cube: ToioCoreCube, sound_id: int, volume: int = 255) -> Dict[str, Any]:
     """
     Play a sound effect on a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to play sound on
+        cube: Cube to play sound on
         sound_id: Sound effect ID (0-10)
         volume: Volume (0-255)
         
     Returns:
         Dict with success status
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        await cube.api.sound.play_sound_effect(sound_id, volume)
-        return {"played": True}
-    except Exception as e:
-        return {"error": str(e)}
+    await cube.api.sound.play_sound_effect(sound_id, volume)
+    return {"played": True}
 
-async def _play_midi(cube_manager: CubeManager, cube_id: str, note: int, duration_ms: int = 1000, volume: int = 255, repeat: int = 0):
+@_with_cube
+async def _play_midi(cube_manager: CubeManager, cube: ToioCoreCube, note: int, duration_ms: int = 1000, volume: int = 255, repeat: int = 0) -> Dict[str, Any]:
     """
     Play a MIDI note on a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to play sound on
+        cube: Cube to play sound on
         note: MIDI note number (0-127)
         duration_ms: Duration in milliseconds (10-2550)
         volume: Volume (0-255)
@@ -430,210 +1016,165 @@ async def _play_midi(cube_manager: CubeManager, cube_id: str, note: int, duratio
     Returns:
         Dict with success status
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-        
-        # MidiNoteオブジェクトを作成
-        midi_note = MidiNote(duration_ms=duration_ms, note=note, volume=volume)
-        # MidiNoteオブジェクトのリストを作成
-        midi_notes = [midi_note]
-        
-        # play_midiメソッドを呼び出す
-        # await cube.api.sound.play_midi(repeat, midi_notes)
-        _ = asyncio.create_task(cube.api.sound.play_midi(repeat, midi_notes)) # 非同期で実行
-        return {"played": True}
-    except Exception as e:
-        return {"error": str(e)}
-
-async def _stop_sound(cube_manager: CubeManager, cube_id: str):
+    # MidiNoteオブジェクトを作成
+    midi_note = MidiNote(duration_ms=duration_ms, note=note, volume=volume)
+    # MidiNoteオブジェクトのリストを作成
+    midi_notes = [midi_note]
+
+    # play_midiメソッドを呼び出す
+    # await cube.api.sound.play_midi(repeat, midi_notes)
+    cube_manager.spawn(cube.api.sound.play_midi(repeat, midi_notes)) # 非同期で実行
+    return {"played": True}
+
+@_with_cube
+async def _stop_sound(cube_manager: CubeManager, cube: ToioCoreCube) -> Dict[str, Any]:
     """
     Stop sound on a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to stop sound on
+        cube: Cube to stop sound on
         
     Returns:
         Dict with success status
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        await cube.api.sound.stop()
-        return {"stopped": True}
-    except Exception as e:
-        return {"error": str(e)}
+    await cube.api.sound.stop()
+    return {"stopped": True}
 
-async def _get_button_state(cube_manager: CubeManager, cube_id: str):
+# ButtonState -> reported state; anything else is reported as released
+_BUTTON_STATE_NAMES = {ButtonState.PRESSED: "pressed"}
+
+@_with_cube
+async def _get_button_state(cube_manager: CubeManager, cube: ToioCoreCube) -> Dict[str, Any]:
     """
     Get the button state of a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to get button state from
+        cube: Cube to get button state from
         
     Returns:
         Dict with button state information
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        button_info = await cube.api.button.read()
-        if button_info is None:
-            return {"error": "Failed to get button information"}
-            
-        return {
-            "state": "pressed" if button_info.state == ButtonState.PRESSED else "released"
-        }
-    except Exception as e:
-        return {"error": str(e)}
+    button_info = await cube.api.button.read()
+    if button_info is None:
+        return {"error": "Failed to get button information"}
 
-async def _get_battery_level(cube_manager: CubeManager, cube_id: str):
+    return {
+        "state": _BUTTON_STATE_NAMES.get(button_info.state, "released")
+    }
+
+@_with_cube
+async def _get_battery_level(cube_manager: CubeManager, cube: ToioCoreCube) -> Dict[str, Any]:
     """
     Get the battery level of a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to get battery level from
+        cube: Cube to get battery level from
         
     Returns:
         Dict with battery level information
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        battery_info = await cube.api.battery.read()
-        if battery_info is None:
-            return {"error": "Failed to get battery information"}
-            
-        return {
-            "level": battery_info.battery_level
-        }
-    except Exception as e:
-        return {"error": str(e)}
-
-async def _get_motion_detection(cube_manager: CubeManager, cube_id: str):
+    battery_info = await cube.api.battery.read()
+    if battery_info is None:
+        return {"error": "Failed to get battery information"}
+
+    return {
+        "level": battery_info.battery_level
+    }
+
+# Attributes set by MotionDetectionData / MagneticSensorData for every payload
+_MOTION_FIELDS = ("horizontal", "collision", "double_tap", "posture", "shake")
+_get_motion_fields = operator.attrgetter(*_MOTION_FIELDS)
+_MAGNETIC_FIELDS = ("state", "strength", "x", "y", "z")
+_get_magnetic_fields = operator.attrgetter(*_MAGNETIC_FIELDS)
+
+@_with_cube
+async def _get_motion_detection(cube_manager: CubeManager, cube: ToioCoreCube) -> Dict[str, Any]:
     """
     Get motion detection information from a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to get motion detection from
+        cube: Cube to get motion detection from
         
     Returns:
         Dict with motion detection information
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        await cube.api.sensor.request_motion_information()
-
-        # The Sensor characteristic is shared with posture / magnetic reads,
-        # so retry until a motion-detection payload appears.
-        motion_data = None
-        for _ in range(10):
-            await asyncio.sleep(0.05)
-            data = await cube.api.sensor.read()
-            if isinstance(data, MotionDetectionData):
-                motion_data = data
-                break
-
-        if motion_data is None:
-            return {"error": "Failed to get motion detection information"}
-
-        result = {
-            "type": "motion_detection"
-        }
-        for attr in ["horizontal", "collision", "double_tap", "posture", "shake"]:
-            if hasattr(motion_data, attr):
-                if attr == "posture" and hasattr(motion_data.posture, "name"):
-                    result[attr] = motion_data.posture.name
-                else:
-                    result[attr] = getattr(motion_data, attr)
-
-        return result
-    except Exception as e:
-        return {"error": str(e)}
-
-async def _get_posture_angle(cube_manager: CubeManager, cube_id: str, data_type: int = 1):
+    motion_data = await cube_manager.request_sensor_data(
+        cube, cube.api.sensor.request_motion_information, MotionDetectionData
+    )
+
+    if motion_data is None:
+        return {"error": "Failed to get motion detection information"}
+
+    result = {
+        "type": "motion_detection"
+    }
+    result.update(zip(_MOTION_FIELDS, _get_motion_fields(motion_data)))
+    if isinstance(result["posture"], Posture):
+        result["posture"] = result["posture"].name
+
+    return result
+
+# data_type -> (request type, expected payload type, result attributes)
+_POSTURE_TYPES: Dict[int, Tuple[PostureDataType, type, Tuple[str, ...]]] = {
+    1: (PostureDataType.Euler, PostureAngleEulerData, ("roll", "pitch", "yaw")),
+    2: (PostureDataType.Quaternions, PostureAngleQuaternionsData, ("w", "x", "y", "z")),
+    3: (PostureDataType.HighPrecisionEuler, PostureAngleHighPrecisionEulerData, ("roll", "pitch", "yaw")),
+}
+
+@_with_cube
+async def _get_posture_angle(cube_manager: CubeManager, cube: ToioCoreCube, data_type: int = 1) -> Dict[str, Any]:
     """
     Get posture angle information from a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to get posture angle from
+        cube: Cube to get posture angle from
         data_type: Posture data type (1: Euler, 2: Quaternions, 3: HighPrecisionEuler)
         
     Returns:
         Dict with posture angle information
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        if data_type == 2:
-            posture_data_type = PostureDataType.Quaternions
-            expected_type = PostureAngleQuaternionsData
-        elif data_type == 3:
-            posture_data_type = PostureDataType.HighPrecisionEuler
-            expected_type = PostureAngleHighPrecisionEulerData
-        else:
-            posture_data_type = PostureDataType.Euler
-            expected_type = PostureAngleEulerData
-
-        await cube.api.sensor.request_posture_angle_information(posture_data_type)
-
-        # Filter by expected payload type — the Sensor characteristic is
-        # shared with motion / magnetic reads.
-        posture_data = None
-        for _ in range(10):
-            await asyncio.sleep(0.05)
-            data = await cube.api.sensor.read()
-            if isinstance(data, expected_type):
-                posture_data = data
-                break
-
-        if posture_data is None:
-            return {"error": "Failed to get posture angle information"}
-
-        result = {
-            "type": "posture_angle"
-        }
-        attrs = ["w", "x", "y", "z"] if data_type == 2 else ["roll", "pitch", "yaw"]
-        for attr in attrs:
-            if hasattr(posture_data, attr):
-                result[attr] = getattr(posture_data, attr)
-
-        return result
-    except Exception as e:
-        return {"error": str(e)}
-
-async def _get_magnetic_sensor(cube_manager: CubeManager, cube_id: str):
+    # Unknown data types fall back to Euler
+    posture_data_type, expected_type, attrs = _POSTURE_TYPES.get(
+        data_type, _POSTURE_TYPES[1]
+    )
+
+    posture_data = await cube_manager.request_sensor_data(
+        cube,
+        functools.partial(
+            cube.api.sensor.request_posture_angle_information, posture_data_type
+        ),
+        expected_type,
+    )
+
+    if posture_data is None:
+        return {"error": "Failed to get posture angle information"}
+
+    result = {
+        "type": "posture_angle"
+    }
+    for attr in attrs:
+        if hasattr(posture_data, attr):
+            result[attr] = getattr(posture_data, attr)
+
+    return result
+
+@_with_cube
+async def _get_magnetic_sensor(cube_manager: CubeManager, cube: ToioCoreCube) -> Dict[str, Any]:
     """
     Get magnetic sensor information from a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to get magnetic sensor information from
+        cube: Cube to get magnetic sensor information from
         
     Returns:
         Dict with magnetic sensor information
     """
-    cube = cube_manager.get_cube(cube_id)
-    if cube is None:
-        return {"error": f"Cube with ID {cube_id} not found"}
-
     enabled = False
     try:
         # Magnetic sensors are disabled by default per toio spec — enable
@@ -644,17 +1185,12 @@ async def _get_magnetic_sensor(cube_manager: CubeManager, cube_id: str):
             condition=MagneticSensorCondition.Always,
         )
         enabled = True
-        await asyncio.sleep(0.1)
-
-        await cube.api.sensor.request_magnetic_sensor_information()
 
-        magnetic_data = None
-        for _ in range(10):
-            await asyncio.sleep(0.05)
-            data = await cube.api.sensor.read()
-            if isinstance(data, MagneticSensorData):
-                magnetic_data = data
-                break
+        # No settle delay needed: the wait below ends on the first magnetic
+        # payload once the new mode takes effect
+        magnetic_data = await cube_manager.request_sensor_data(
+            cube, cube.api.sensor.request_magnetic_sensor_information, MagneticSensorData
+        )
 
         if magnetic_data is None:
             return {"error": "Failed to get magnetic sensor information"}
@@ -662,13 +1198,9 @@ async def _get_magnetic_sensor(cube_manager: CubeManager, cube_id: str):
         result = {
             "type": "magnetic_sensor"
         }
-        for attr in ["state", "strength", "x", "y", "z"]:
-            if hasattr(magnetic_data, attr):
-                result[attr] = getattr(magnetic_data, attr)
+        result.update(zip(_MAGNETIC_FIELDS, _get_magnetic_fields(magnetic_data)))
 
         return result
-    except Exception as e:
-        return {"error": str(e)}
     finally:
         # Treat this tool as one-shot — stop the 20ms magnetic stream so it
         # does not drain power or pollute later motion / posture reads.
@@ -682,151 +1214,110 @@ async def _get_magnetic_sensor(cube_manager: CubeManager, cube_id: str):
             except Exception:
                 logger.exception("Failed to disable magnetic sensor after read")
 
-async def _set_repeated_indicator(cube_manager: CubeManager, cube_id: str, repeat: int, params: List[Dict[str, Any]]):
+@_with_cube
+async def _set_repeated_indicator(cube_manager: CubeManager, cube: ToioCoreCube, repeat: int, params: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Set repeated LED indicator on a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to control
+        cube: Cube to control
         repeat: Number of repetitions (0 for infinite)
         params: List of indicator parameters, each with duration_ms, r, g, b
         
     Returns:
         Dict with success status
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-        
-        param_list = []
-        for p in params:
-            color = Color(p["r"], p["g"], p["b"])
-            param = IndicatorParam(duration_ms=p["duration_ms"], color=color)
-            param_list.append(param)
-            
-        # await cube.api.indicator.repeated_turn_on(repeat, param_list)
-        _ = asyncio.create_task(cube.api.indicator.repeated_turn_on(repeat, param_list)) # 非同期で実行
-        return {"set": True}
-    except Exception as e:
-        return {"error": str(e)}
+    param_list = [
+        IndicatorParam(duration_ms=p["duration_ms"], color=Color(p["r"], p["g"], p["b"]))
+        for p in params
+    ]
 
-async def _turn_off_indicator(cube_manager: CubeManager, cube_id: str, indicator_id: int = None):
+    # await cube.api.indicator.repeated_turn_on(repeat, param_list)
+    cube_manager.spawn(cube.api.indicator.repeated_turn_on(repeat, param_list)) # 非同期で実行
+    return {"set": True}
+
+@_with_cube
+async def _turn_off_indicator(cube_manager: CubeManager, cube: ToioCoreCube, indicator_id: int = None) -> Dict[str, Any]:
     """
     Turn off LED indicator on a toio Core Cube
     
     Args:
         cube_manager: CubeManager instance
-        cube_id: Cube ID to control
+        cube: Cube to control
         indicator_id: Indicator ID to turn off (None for all)
         
     Returns:
         Dict with success status
     """
-    try:
-        cube = cube_manager.get_cube(cube_id)
-        if cube is None:
-            return {"error": f"Cube with ID {cube_id} not found"}
-            
-        if indicator_id is None:
-            await cube.api.indicator.turn_off_all()
-        else:
-            await cube.api.indicator.turn_off(indicator_id)
-        return {"turned_off": True}
-    except Exception as e:
-        return {"error": str(e)}
-
-# Wrapper functions for tools
-def _scan_cubes_wrapper(cube_manager: CubeManager):
-    async def wrapper(num: int = 1, timeout: float = 5.0) -> Dict[str, Any]:
-        return await _scan_cubes(cube_manager, num, timeout)
-    return wrapper
-
-def _connect_cube_wrapper(cube_manager: CubeManager):
-    async def wrapper(device_id: str) -> Dict[str, Any]:
-        return await _connect_cube(cube_manager, device_id)
-    return wrapper
-
-def _disconnect_cube_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _disconnect_cube(cube_manager, cube_id)
-    return wrapper
+    if indicator_id is None:
+        await cube.api.indicator.turn_off_all()
+    else:
+        await cube.api.indicator.turn_off(indicator_id)
+    return {"turned_off": True}
 
-def _get_connected_cubes_wrapper(cube_manager: CubeManager):
-    async def wrapper() -> Dict[str, Any]:
-        return await _get_connected_cubes(cube_manager)
-    return wrapper
-
-def _motor_control_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, left: int, right: int, duration_ms: int = 0) -> Dict[str, Any]:
-        return await _motor_control(cube_manager, cube_id, left, right, duration_ms)
-    return wrapper
-
-def _motor_stop_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _motor_stop(cube_manager, cube_id)
-    return wrapper
-
-def _set_indicator_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, r: int, g: int, b: int, duration_ms: int = 0) -> Dict[str, Any]:
-        return await _set_indicator(cube_manager, cube_id, r, g, b, duration_ms)
-    return wrapper
-
-def _get_position_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _get_position(cube_manager, cube_id)
-    return wrapper
-
-def _play_sound_effect_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, sound_id: int, volume: int = 255) -> Dict[str, Any]:
-        return await _play_sound_effect(cube_manager, cube_id, sound_id, volume)
-    return wrapper
-
-def _play_midi_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, note: int, duration_ms: int = 1000, volume: int = 255, repeat: int = 0) -> Dict[str, Any]:
-        return await _play_midi(cube_manager, cube_id, note, duration_ms, volume, repeat)
-    return wrapper
-
-def _stop_sound_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _stop_sound(cube_manager, cube_id)
-    return wrapper
-
-def _get_button_state_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _get_button_state(cube_manager, cube_id)
-    return wrapper
-
-def _get_battery_level_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _get_battery_level(cube_manager, cube_id)
-    return wrapper
-
-def _get_motion_detection_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _get_motion_detection(cube_manager, cube_id)
-    return wrapper
 
-def _get_posture_angle_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, data_type: int = 1) -> Dict[str, Any]:
-        return await _get_posture_angle(cube_manager, cube_id, data_type)
-    return wrapper
+def _bind_tool(fn: Callable[..., Any], cube_manager: CubeManager) -> Callable[..., Any]:
+    """
+    Bind a CubeManager to a tool coroutine
 
-def _get_magnetic_sensor_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str) -> Dict[str, Any]:
-        return await _get_magnetic_sensor(cube_manager, cube_id)
-    return wrapper
+    functools.partial keeps the remaining parameters visible to FastMCP's
+    signature introspection without adding a wrapper frame per call.
 
-def _set_repeated_indicator_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, repeat: int, params: List[Dict[str, Any]]) -> Dict[str, Any]:
-        return await _set_repeated_indicator(cube_manager, cube_id, repeat, params)
-    return wrapper
+    Args:
+        fn: Tool coroutine taking cube_manager as its first argument
+        cube_manager: CubeManager instance
 
-def _turn_off_indicator_wrapper(cube_manager: CubeManager):
-    async def wrapper(cube_id: str, indicator_id: int = None) -> Dict[str, Any]:
-        return await _turn_off_indicator(cube_manager, cube_id, indicator_id)
-    return wrapper
+    Returns:
+        Callable registered with the MCP server
+    """
+    tool = functools.partial(fn, cube_manager)
+    # FastMCP names the argument model after __name__; do not set __wrapped__,
+    # which would expose cube_manager in the tool signature again
+    tool.__name__ = fn.__name__
+    return tool
+
+
+# (tool coroutine, tool name, description) registered by ToioMCPServer
+_TOOL_SPECS = (
+    # Scanner tools
+    (_scan_cubes, "scan_cubes", "Scan for toio Core Cubes"),
+    (_connect_cube, "connect_cube", "Connect to a toio Core Cube"),
+    (_connect_cubes, "connect_cubes", "Connect to several toio Core Cubes at once"),
+    (_disconnect_cube, "disconnect_cube", "Disconnect from a toio Core Cube"),
+    (_get_connected_cubes, "get_connected_cubes", "Get a list of connected cubes"),
+    # Motor tools
+    (
+        _motor_control,
+        "motor_control",
+        "Control the motors of a toio Core Cube. Returns once the command is"
+        " sent, without waiting for the cube to acknowledge it. A command"
+        " identical to the previous one still being sent is dropped. A failed"
+        " write is reported as an error by the next motor_control call. A"
+        " command still waiting to be sent when motor_stop is called is"
+        " dropped and reported as dropped.",
+    ),
+    (_motor_stop, "motor_stop", "Stop the motors of a toio Core Cube"),
+    # LED tools
+    (_set_indicator, "set_indicator", "Set the LED color of a toio Core Cube"),
+    # Position tools
+    (_get_position, "get_position", "Get the position of a toio Core Cube"),
+    # サウンド関連ツール
+    (_play_sound_effect, "play_sound_effect", "Play a sound effect on a toio Core Cube"),
+    (_play_midi, "play_midi", "Play a MIDI note on a toio Core Cube"),
+    (_stop_sound, "stop_sound", "Stop sound on a toio Core Cube"),
+    # ボタン関連ツール
+    (_get_button_state, "get_button_state", "Get the button state of a toio Core Cube"),
+    # バッテリー関連ツール
+    (_get_battery_level, "get_battery_level", "Get the battery level of a toio Core Cube"),
+    # センサー関連ツール
+    (_get_motion_detection, "get_motion_detection", "Get motion detection information from a toio Core Cube"),
+    (_get_posture_angle, "get_posture_angle", "Get posture angle information from a toio Core Cube"),
+    (_get_magnetic_sensor, "get_magnetic_sensor", "Get magnetic sensor information from a toio Core Cube"),
+    # 追加のLEDインジケーター関連ツール
+    (_set_repeated_indicator, "set_repeated_indicator", "Set repeated LED indicator on a toio Core Cube"),
+    (_turn_off_indicator, "turn_off_indicator", "Turn off LED indicator on a toio Core Cube"),
+)
 
 
 #################################################
@@ -838,135 +1329,49 @@ class ToioMCPServer:
     ToioMCPServer class for providing toio Core Cube functionality via MCP
     """
 
+    __slots__ = ("cube_manager", "server")
+
     def __init__(self):
         """Initialize ToioMCPServer"""
         self.cube_manager = CubeManager()
-        self.server = FastMCP(name="toio-mcp")
-        # Register tools
-        self._register_tools()
+        # Built on first start() so paths that never serve skip the MCP stack
+        self.server: Optional["FastMCP"] = None
+
+    def _build(self) -> "FastMCP":
+        """Create the MCP server and register all tools with it"""
+        if self.server is None:
+            from mcp.server.fastmcp import FastMCP
+
+            self.server = FastMCP(name="toio-mcp", lifespan=self._lifespan)
+            # Register tools
+            self._register_tools()
+        return self.server
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, server: "FastMCP") -> AsyncIterator[None]:
+        """
+        Disconnect all cubes when the MCP server shuts down
+
+        Runs on the server's event loop, so connected cubes are released on
+        every shutdown path, including the client closing stdin.
+        """
+        try:
+            yield
+        finally:
+            await self.cube_manager.disconnect_all()
 
     def _register_tools(self):
         """Register all tools with the MCP server"""
-        # Scanner tools
-        self.server.add_tool(
-            _scan_cubes_wrapper(self.cube_manager),
-            name="scan_cubes",
-            description="Scan for toio Core Cubes"
-        )
-        
-        self.server.add_tool(
-            _connect_cube_wrapper(self.cube_manager),
-            name="connect_cube",
-            description="Connect to a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _disconnect_cube_wrapper(self.cube_manager),
-            name="disconnect_cube",
-            description="Disconnect from a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _get_connected_cubes_wrapper(self.cube_manager),
-            name="get_connected_cubes",
-            description="Get a list of connected cubes"
-        )
-        
-        # Motor tools
-        self.server.add_tool(
-            _motor_control_wrapper(self.cube_manager),
-            name="motor_control",
-            description="Control the motors of a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _motor_stop_wrapper(self.cube_manager),
-            name="motor_stop",
-            description="Stop the motors of a toio Core Cube"
-        )
-        
-        # LED tools
-        self.server.add_tool(
-            _set_indicator_wrapper(self.cube_manager),
-            name="set_indicator",
-            description="Set the LED color of a toio Core Cube"
-        )
-        
-        # Position tools
-        self.server.add_tool(
-            _get_position_wrapper(self.cube_manager),
-            name="get_position",
-            description="Get the position of a toio Core Cube"
-        )
-        
-        # サウンド関連ツール
-        self.server.add_tool(
-            _play_sound_effect_wrapper(self.cube_manager),
-            name="play_sound_effect",
-            description="Play a sound effect on a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _play_midi_wrapper(self.cube_manager),
-            name="play_midi",
-            description="Play a MIDI note on a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _stop_sound_wrapper(self.cube_manager),
-            name="stop_sound",
-            description="Stop sound on a toio Core Cube"
-        )
-        
-        # ボタン関連ツール
-        self.server.add_tool(
-            _get_button_state_wrapper(self.cube_manager),
-            name="get_button_state",
-            description="Get the button state of a toio Core Cube"
-        )
-        
-        # バッテリー関連ツール
-        self.server.add_tool(
-            _get_battery_level_wrapper(self.cube_manager),
-            name="get_battery_level",
-            description="Get the battery level of a toio Core Cube"
-        )
-        
-        # センサー関連ツール
-        self.server.add_tool(
-            _get_motion_detection_wrapper(self.cube_manager),
-            name="get_motion_detection",
-            description="Get motion detection information from a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _get_posture_angle_wrapper(self.cube_manager),
-            name="get_posture_angle",
-            description="Get posture angle information from a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _get_magnetic_sensor_wrapper(self.cube_manager),
-            name="get_magnetic_sensor",
-            description="Get magnetic sensor information from a toio Core Cube"
-        )
-        
-        # 追加のLEDインジケーター関連ツール
-        self.server.add_tool(
-            _set_repeated_indicator_wrapper(self.cube_manager),
-            name="set_repeated_indicator",
-            description="Set repeated LED indicator on a toio Core Cube"
-        )
-        
-        self.server.add_tool(
-            _turn_off_indicator_wrapper(self.cube_manager),
-            name="turn_off_indicator",
-            description="Turn off LED indicator on a toio Core Cube"
-        )
+        for fn, name, description in _TOOL_SPECS:
+            self.server.add_tool(
+                _bind_tool(fn, self.cube_manager),
+                name=name,
+                description=description
+            )
 
     def start(self):
         """Start the MCP server"""
-        self.server.run(transport='stdio')
+        self._build().run(transport='stdio')
 
     async def stop(self):
         """Stop the MCP server"""
@@ -977,22 +1382,73 @@ class ToioMCPServer:
 # CLI interface
 #################################################
 
-app = typer.Typer()
+def _parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """
+    Parse command line arguments
+
+    Args:
+        argv: Arguments to parse, defaults to sys.argv[1:]
 
-@app.command()
-def main(
-    host: str = typer.Option("127.0.0.1", help="Host to bind to"),
-    port: int = typer.Option(8000, help="Port to bind to"),
-    debug: bool = typer.Option(False, help="Enable debug logging"),
-):
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Start the toio-mcp server")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
+    parser.add_argument(
+        "--debug",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Enable debug logging",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
     """
     Start the toio-mcp server
     """
+    args = _parse_args(argv)
+    host, port, debug = args.host, args.port, args.debug
+
+    # Configure logging; stdout carries the MCP protocol, so log to stderr
     if debug:
-        logging.getLogger().setLevel(logging.CRITICAL)
-        logger.debug("Debug logging enabled")
+        from rich.console import Console
+        from rich.logging import RichHandler
+
+        handler: logging.Handler = RichHandler(
+            console=Console(stderr=True), rich_tracebacks=True
+        )
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    logging.basicConfig(
+        level=logging.DEBUG if debug else logging.CRITICAL,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[handler],
+    )
+    logger.debug("Debug logging enabled")
+
+    # This does not affect MCP messages: FastMCP writes them through its own
+    # wrapper on sys.stdout.buffer and flushes each one. It only makes stray
+    # writes to stdout (e.g. a library's print) and non-logging writes to
+    # stderr go out at once instead of being held in the buffer and showing
+    # up later out of order
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=True, write_through=True)
+    if hasattr(sys.stderr, "reconfigure"):
+        sys.stderr.reconfigure(line_buffering=True)
+
+    # Use the libuv-based event loop when available (not supported on Windows)
+    if sys.platform != "win32":
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
-    logger.info(f"Starting toio-mcp server on {host}:{port}")
+    logger.info("Starting toio-mcp server on %s:%d", host, port)
     
     server = ToioMCPServer()
     
@@ -1003,9 +1459,9 @@ def main(
         asyncio.run(server.stop())
         logger.info("Server stopped")
     except Exception as e:
-        logger.error(f"Error: {e}")
+        logger.error("Error: %s", e)
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    app()
+    main()
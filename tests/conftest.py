@@ -0,0 +1,131 @@
+"""
+Fakes for exercising CubeManager without Bluetooth hardware
+"""
+
+import asyncio
+import types
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import pytest
+
+import server
+
+
+class FakeMotor:
+    """Motor characteristic recording every write that lands"""
+
+    def __init__(self):
+        self.writes: List[Tuple[int, int, int]] = []
+        self.delay = 0.0
+        self.error: Optional[Exception] = None
+
+    def motor_control(
+        self, left: int, right: int, duration_ms: int = 0
+    ) -> Awaitable[None]:
+        # Take the delay when the write is issued, so a test can slow down
+        # one write without affecting the ones after it
+        return self._write((left, right, duration_ms), self.delay)
+
+    async def _write(self, command: Tuple[int, int, int], delay: float) -> None:
+        if self.error is not None:
+            raise self.error
+        await asyncio.sleep(delay)
+        self.writes.append(command)
+
+
+class FakeNotifier:
+    """Characteristic that only tracks notification handlers"""
+
+    def __init__(self):
+        self.handlers: List[Any] = []
+        # Seconds the notification start takes once the handler is stored
+        self.delay = 0.0
+
+    async def register_notification_handler(self, handler: Any) -> bool:
+        self.handlers.append(handler)
+        await asyncio.sleep(self.delay)
+        return True
+
+    async def unregister_notification_handler(self, handler: Any) -> bool:
+        if handler in self.handlers:
+            self.handlers.remove(handler)
+        return True
+
+
+class FakeSensor(FakeNotifier):
+    """Sensor characteristic answering motion requests with a notification"""
+
+    def __init__(self):
+        super().__init__()
+        self.register_count = 0
+
+    async def register_notification_handler(self, handler: Any) -> bool:
+        self.register_count += 1
+        return await super().register_notification_handler(handler)
+
+    async def request_motion_information(self) -> None:
+        # id, horizontal, collision, double_tap, posture (top), shake
+        payload = bytearray([0x01, 1, 0, 0, 1, 0])
+        for handler in self.handlers:
+            asyncio.get_running_loop().call_soon(handler, payload)
+
+
+class FakeCube:
+    """Stand-in for ToioCoreCube"""
+
+    def __init__(self, interface: Any = None):
+        self.connected = False
+        self.connect_count = 0
+        self.disconnect_count = 0
+        self.api = types.SimpleNamespace(
+            motor=FakeMotor(),
+            id_information=FakeNotifier(),
+            sensor=FakeSensor(),
+        )
+
+    async def connect(self) -> bool:
+        self.connect_count += 1
+        self.connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        self.disconnect_count += 1
+        self.connected = False
+        return True
+
+    def is_connect(self) -> bool:
+        return self.connected
+
+
+class FakeScanner:
+    """Stand-in for the shared BleakScanner"""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+@pytest.fixture
+def cube_manager(monkeypatch: pytest.MonkeyPatch) -> server.CubeManager:
+    """CubeManager whose BLE layer is replaced by fakes"""
+    monkeypatch.setattr(server, "BleCube", lambda device: None)
+    monkeypatch.setattr(server, "ToioCoreCube", FakeCube)
+    manager = server.CubeManager()
+    manager._scanner = FakeScanner()
+    return manager
+
+
+@pytest.fixture
+def advertise(cube_manager: server.CubeManager) -> Callable[..., None]:
+    """Feed toio Core Cube advertisements to the manager's scanner callback"""
+
+    def advertise(address: str, rssi: int = -50) -> None:
+        device = types.SimpleNamespace(address=address, name=f"toio-{address[-2:]}")
+        advertisement = types.SimpleNamespace(
+            service_uuids=[server.TOIO_SERVICE_UUID], rssi=rssi
+        )
+        cube_manager._on_advertisement(device, advertisement)
+
+    return advertise
@@ -0,0 +1,96 @@
+"""
+Regression tests for CubeManager connection handling
+"""
+
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.asyncio
+
+ADDRESS_A = "AA:BB:CC:DD:EE:01"
+ADDRESS_B = "AA:BB:CC:DD:EE:02"
+ADDRESS_C = "AA:BB:CC:DD:EE:03"
+
+
+async def test_disconnect_removes_cube_with_lost_link(cube_manager, advertise):
+    advertise(ADDRESS_A)
+    cube_id = await cube_manager.connect_cube(ADDRESS_A)
+    cube = cube_manager.get_cube(cube_id)
+    cube.connected = False
+
+    assert await cube_manager.disconnect_cube(cube_id)
+    assert cube_manager.get_connected_cubes() == []
+
+
+async def test_disconnect_tool_closes_link(cube_manager, advertise):
+    advertise(ADDRESS_A)
+    cube_id = await cube_manager.connect_cube(ADDRESS_A)
+    cube = cube_manager.get_cube(cube_id)
+
+    result = await server._disconnect_cube(cube_manager, cube_id)
+    assert result == {"disconnected": True}
+    assert cube_manager.get_connected_cubes() == []
+    assert not cube.is_connect()
+
+
+async def test_lifespan_disconnects_cubes(cube_manager, advertise):
+    advertise(ADDRESS_A)
+    cube_id = await cube_manager.connect_cube(ADDRESS_A)
+    cube = cube_manager.get_cube(cube_id)
+    toio_server = server.ToioMCPServer()
+    toio_server.cube_manager = cube_manager
+
+    async with toio_server._lifespan(None):
+        pass
+    assert cube_manager.get_connected_cubes() == []
+    assert not cube.is_connect()
+
+
+async def test_sensor_handler_is_registered_once(cube_manager, advertise):
+    advertise(ADDRESS_A)
+    cube_id = await cube_manager.connect_cube(ADDRESS_A)
+    cube = cube_manager.get_cube(cube_id)
+
+    for _ in range(2):
+        result = await server._get_motion_detection(cube_manager, cube_id)
+        assert result["horizontal"] is True
+    assert cube.api.sensor.register_count == 1
+
+
+async def test_cancelled_position_subscription_is_undone(cube_manager, advertise):
+    advertise(ADDRESS_A)
+    cube_id = await cube_manager.connect_cube(ADDRESS_A)
+    cube = cube_manager.get_cube(cube_id)
+    cube.api.id_information.delay = 0.1
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(cube_manager.read_position(cube_id), 0.01)
+    await asyncio.sleep(0)
+    assert cube.api.id_information.handlers == []
+    assert cube_id not in cube_manager._position_handlers
+
+
+async def test_connect_cubes_waits_once_for_missing_devices(
+    cube_manager, advertise, monkeypatch
+):
+    monkeypatch.setattr(server, "CONNECT_SCAN_TIMEOUT", 0.2)
+    advertise(ADDRESS_A)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    results = await cube_manager.connect_cubes([ADDRESS_A, ADDRESS_B, ADDRESS_C])
+    assert loop.time() - start < 0.35
+    assert results[0] == "cube_1"
+    assert all(isinstance(r, ValueError) for r in results[1:])
+
+
+async def test_scan_skips_connected_cubes(cube_manager, advertise):
+    advertise(ADDRESS_A)
+    await cube_manager.connect_cube(ADDRESS_A)
+    asyncio.get_running_loop().call_later(0.05, advertise, ADDRESS_B)
+
+    devices = await cube_manager.scan_cubes(num=1, timeout=1.0)
+    assert [d["device_id"] for d in devices] == [ADDRESS_B]
@@ -0,0 +1,94 @@
+"""
+Regression tests for CubeManager motor command pipelining
+"""
+
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.asyncio
+
+ADDRESS = "AA:BB:CC:DD:EE:01"
+
+
+async def connected_cube(cube_manager, advertise):
+    advertise(ADDRESS)
+    cube_id = await cube_manager.connect_cube(ADDRESS)
+    cube = cube_manager.get_cube(cube_id)
+    cube.api.motor.delay = 0.01
+    return cube_id, cube
+
+
+async def test_stop_lands_after_in_flight_writes(cube_manager, advertise):
+    cube_id, cube = await connected_cube(cube_manager, advertise)
+    cube.api.motor.delay = 0.05
+    await cube_manager.motor_control(cube_id, 50, 50)
+    await cube_manager.motor_control(cube_id, 30, 30)
+    cube.api.motor.delay = 0.0
+
+    await cube_manager.motor_stop(cube_id)
+    assert cube.api.motor.writes == [(50, 50, 0), (30, 30, 0), (0, 0, 0)]
+
+
+async def test_disconnect_waits_for_in_flight_writes(cube_manager, advertise):
+    cube_id, cube = await connected_cube(cube_manager, advertise)
+    cube.api.motor.delay = 0.05
+    await cube_manager.motor_control(cube_id, 50, 50)
+
+    assert await cube_manager.disconnect_cube(cube_id)
+    # The write landed before the link was closed
+    assert cube.api.motor.writes == [(50, 50, 0)]
+    assert not cube.is_connect()
+
+
+async def test_identical_in_flight_command_is_dropped(cube_manager, advertise):
+    cube_id, cube = await connected_cube(cube_manager, advertise)
+    await cube_manager.motor_control(cube_id, 50, 50)
+    await cube_manager.motor_control(cube_id, 50, 50)
+
+    await cube_manager.motor_stop(cube_id)
+    assert cube.api.motor.writes == [(50, 50, 0), (0, 0, 0)]
+
+
+async def test_failed_write_is_reported_by_next_call(cube_manager, advertise):
+    cube_id, cube = await connected_cube(cube_manager, advertise)
+    cube.api.motor.error = OSError("write failed")
+    await cube_manager.motor_control(cube_id, 50, 50)
+    await asyncio.sleep(0)
+    cube.api.motor.error = None
+
+    with pytest.raises(OSError):
+        await cube_manager.motor_control(cube_id, 30, 30)
+    await cube_manager.motor_control(cube_id, 30, 30)
+    await cube_manager.motor_stop(cube_id)
+    assert cube.api.motor.writes == [(30, 30, 0), (0, 0, 0)]
+
+
+async def test_stop_ignores_earlier_failed_write(cube_manager, advertise):
+    cube_id, cube = await connected_cube(cube_manager, advertise)
+    cube.api.motor.error = OSError("write failed")
+    await cube_manager.motor_control(cube_id, 50, 50)
+    await asyncio.sleep(0)
+    cube.api.motor.error = None
+
+    assert await server._motor_stop(cube_manager, cube_id) == {"stopped": True}
+    assert cube.api.motor.writes == [(0, 0, 0)]
+    # The failure is not reported again by the next command either
+    await cube_manager.motor_control(cube_id, 30, 30)
+
+
+async def test_waiting_command_is_dropped_by_stop(cube_manager, advertise):
+    cube_id, cube = await connected_cube(cube_manager, advertise)
+    cube.api.motor.delay = 0.05
+    await cube_manager.motor_control(cube_id, 50, 50)
+    await cube_manager.motor_control(cube_id, 30, 30)
+    waiting = asyncio.create_task(server._motor_control(cube_manager, cube_id, 10, 10))
+    await asyncio.sleep(0)
+    cube.api.motor.delay = 0.0
+
+    await cube_manager.motor_stop(cube_id)
+    assert await waiting == {"controlled": False, "dropped": True}
+    await asyncio.sleep(0.1)
+    assert cube.api.motor.writes == [(50, 50, 0), (30, 30, 0), (0, 0, 0)]